@@ -2,18 +2,26 @@
 应用包初始化：
 - 确保首次启动时数据库表存在（如不存在则创建）
 """
+
+import os
+
 from app.config import settings
 from app.db import DB
 from app.log import logger
-from pathlib import Path
+
+# 已完成检查的数据库路径，子进程（如多 worker 预 fork）继承后，同一数据库可跳过检查
+_DB_INITIALIZED_ENV = "PMS_DB_INITIALIZED"
 
 
 def _ensure_db():
     try:
         db_path = settings.DATA_PATH / "data.db"
+        if os.environ.get(_DB_INITIALIZED_ENV) == str(db_path):
+            return
         if not db_path.exists():
             logger.info(f"初始化数据库: {db_path}")
             DB().create_table()
+        os.environ[_DB_INITIALIZED_ENV] = str(db_path)
     except Exception as e:
         logger.error(f"数据库初始化失败: {e}")
 
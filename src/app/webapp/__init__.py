@@ -1,6 +1,11 @@
+import asyncio
+import functools
+import hashlib
+import json
 import secrets
 import os
 import re
+import tempfile
 from pathlib import Path
 
 from app.config import settings
@@ -12,61 +17,88 @@ from app.webapp.routers.activities.luckywheel import router as luckywheel_router
 from app.webapp.routers.admin import router as admin_router
 from app.webapp.routers.invitation import router as invitation_router
 from app.webapp.routers.premium import router as premium_router
-from app.webapp.startup.lifespan import lifespan
-from fastapi import FastAPI, Response
+from app.webapp.startup.lifespan import create_lifespan
+from dotenv import dotenv_values
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import RedirectResponse, FileResponse
+from fastapi.responses import HTMLResponse, RedirectResponse
 from starlette.middleware.sessions import SessionMiddleware
 
-# 创建 FastAPI 应用
-app = FastAPI(
-    title="PMSManageBot API",
-    description="API for PMSManageBot WebApp",
-    lifespan=lifespan,
+# index.html 标题注入使用的正则，模块加载时编译一次
+_TITLE_OR_HEAD_CLOSE_RE = re.compile(
+    r"(<title>.*?</title>)|(</head>)", re.IGNORECASE | re.DOTALL
 )
+_HEAD_CLOSE_RE = re.compile(r"</head>", re.IGNORECASE)
+# 前端构建产物中带内容哈希的文件名，如 app.1a2b3c4d.js、chunk-vendors.1a2b3c4d.css
+_HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.(?:js|css|woff2?|ttf|eot)$")
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
-# 配置 SessionMiddleware
-app.add_middleware(
-    SessionMiddleware,
-    # 会话密钥读取顺序：环境变量(WEBAPP_SESSION_SECRET_KEY/SESSION_SECRET_KEY) → settings 同名字段 → 随机
-    secret_key=(
+# 前端静态文件路径，模块加载时确定一次
+_STATIC_DIR = Path(settings.WEBAPP_STATIC_DIR).absolute()
+_INDEX_FILE = _STATIC_DIR / "index.html"
+
+
+def _resolve_session_secret() -> str:
+    """解析会话密钥：环境变量(WEBAPP_SESSION_SECRET_KEY/SESSION_SECRET_KEY) → settings 同名字段 → 持久化文件
+
+    未配置时生成随机密钥并写入 DATA_PATH/.session_secret，重启后沿用，避免已有会话全部失效。
+    """
+    secret = (
         os.getenv("WEBAPP_SESSION_SECRET_KEY")
         or os.getenv("SESSION_SECRET_KEY")
         or getattr(settings, "WEBAPP_SESSION_SECRET_KEY", None)
         or getattr(settings, "SESSION_SECRET_KEY", None)
-        or secrets.token_urlsafe(32)
-    ),
-    session_cookie="pmsmanagebot_session",
-    max_age=86400,  # 1天过期
-)
+    )
+    if secret:
+        return secret
 
-# 配置 CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # 在生产环境中，应该设置为特定的域名
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+    secret_file = settings.DATA_PATH / ".session_secret"
+    try:
+        if not secret_file.exists():
+            # 先写入同目录临时文件（mkstemp 创建即为 0600），再用 os.link 原子发布，
+            # 其他进程只会看到完整内容；若已被并发创建则 link 失败，沿用对方的密钥
+            fd, tmp_path = tempfile.mkstemp(
+                dir=secret_file.parent, prefix=".session_secret."
+            )
+            try:
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    f.write(secrets.token_urlsafe(32))
+                os.link(tmp_path, secret_file)
+                logger.info(f"已生成会话密钥: {secret_file}")
+            except FileExistsError:
+                pass
+            finally:
+                os.unlink(tmp_path)
+        secret = secret_file.read_text(encoding="utf-8").strip()
+        if secret:
+            return secret
+        error = f"{secret_file} 内容为空"
+    except Exception as e:
+        error = e
+    logger.warning(f"读取或保存会话密钥失败，使用临时随机密钥: {error}")
+    return secrets.token_urlsafe(32)
 
-# 添加 Telegram 认证中间件
-app.add_middleware(TelegramAuthMiddleware)
 
-# 注册路由
-app.include_router(user_router)
-app.include_router(rankings_router)
-app.include_router(system_router)  # 添加系统统计路由
-app.include_router(invitation_router)  # 添加邀请码路由
-app.include_router(premium_router)  # 添加 Premium 路由
-app.include_router(admin_router)  # 添加管理员路由
-app.include_router(luckywheel_router, prefix="/api")  # 添加幸运大转盘路由
-app.include_router(auction_router, prefix="/api")  # 添加竞拍活动路由
+class CachedStaticFiles(StaticFiles):
+    """为带内容哈希的构建产物（如 js/app.1a2b3c4d.js）添加长期强缓存
+
+    文件名中的哈希随内容变化，浏览器可直接使用本地缓存而无需条件请求；
+    其余文件（index.html、图片等）保持 Starlette 默认的 ETag/Last-Modified 校验。
+    """
+
+    def file_response(
+        self, full_path, stat_result, scope, status_code: int = 200
+    ) -> Response:
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if status_code == 200 and _HASHED_ASSET_RE.search(str(full_path)):
+            response.headers["Cache-Control"] = _IMMUTABLE_CACHE_CONTROL
+        return response
 
 
 def setup_static_files():
     """配置静态文件服务"""
-    static_dir = Path(settings.WEBAPP_STATIC_DIR).absolute()
+    static_dir = _STATIC_DIR
     if not static_dir.exists():
         logger.warning(f"WebApp 静态文件目录不存在: {static_dir}")
         return False
@@ -81,15 +113,31 @@ def setup_static_files():
             logger.debug(f"预写入 WEBAPP_TITLE 到 index.html 失败: {e}")
 
         # 注意：避免挂载在根路径 "/"，否则会遮蔽 /api/* 路由
-        app.mount("/app", StaticFiles(directory=str(static_dir), html=True), name="webapp")
+        app.mount(
+            "/app",
+            CachedStaticFiles(directory=str(static_dir), html=True),
+            name="webapp",
+        )
         return True
     except Exception as e:
         logger.error(f"挂载 WebApp 静态文件失败: {e}")
         return False
 
 
+def _load_env_file(env_path: str) -> dict[str, str | None]:
+    """解析 .env 文件为字典；由 _get_title_override 的缓存保证每个进程最多解析一次"""
+    if not Path(env_path).exists():
+        return {}
+    return dotenv_values(env_path, encoding="utf-8")
+
+
+@functools.lru_cache(maxsize=1)
 def _get_title_override() -> str | None:
-    """获取需要注入的 WEBAPP_TITLE：优先环境变量，然后 settings，最后 .env 文件兜底。"""
+    """获取需要注入的 WEBAPP_TITLE：优先环境变量，然后 settings，最后 .env 文件兜底。
+
+    标题只在部署时配置，运行期间不会修改，结果缓存于进程内；
+    如需重新读取可调用 _get_title_override.cache_clear()。
+    """
     # 1) 环境变量优先（便于 systemd 覆盖）
     title = os.getenv("WEBAPP_TITLE") or os.getenv("SITE_NAME")
     if title:
@@ -104,23 +152,35 @@ def _get_title_override() -> str | None:
     try:
         env_path = getattr(settings, "ENV_FILE_PATH", None)
         if env_path:
-            env_path = Path(env_path)
-            if env_path.exists():
-                with env_path.open("r", encoding="utf-8") as f:
-                    for line in f:
-                        line = line.strip()
-                        if not line or line.startswith("#"):
-                            continue
-                        key = line.split("=", 1)[0].strip()
-                        if key in ("WEBAPP_TITLE", "SITE_NAME"):
-                            value = line.split("=", 1)[1].strip().strip('"').strip("'")
-                            if value:
-                                return value
+            env_values = _load_env_file(str(env_path))
+            title = env_values.get("WEBAPP_TITLE") or env_values.get("SITE_NAME")
+            if title and title.strip():
+                return title.strip()
     except Exception as e:
         logger.debug(f"读取 .env 中 WEBAPP_TITLE 失败: {e}")
     return None
 
 
+def _inject_title(html: str, title: str, head_suffix: str = "") -> str:
+    """将 <title> 注入为指定值：
+
+    - 替换首个 <title>，或在 </head> 前插入（以先出现者为准）
+    - head_suffix（如强制设置标题的脚本）追加在首个 </head> 之前
+    - 缺少 </head> 时，补一个最小 head
+    """
+    title_tag = f"<title>{title}</title>"
+    match = _TITLE_OR_HEAD_CLOSE_RE.search(html)
+    if match is not None and match.group(1) is not None:
+        html = html[: match.start()] + title_tag + html[match.end() :]
+        if not head_suffix:
+            return html
+        title_tag = ""
+        match = _HEAD_CLOSE_RE.search(html, match.start())
+    if match is None:
+        return "<head>" + title_tag + head_suffix + "</head>" + html
+    return html[: match.start()] + title_tag + head_suffix + html[match.start() :]
+
+
 def _apply_title_to_index_file(static_dir: Path, title: str):
     """直接修改磁盘上的 index.html，将 <title> 注入为指定值。
 
@@ -133,15 +193,7 @@ def _apply_title_to_index_file(static_dir: Path, title: str):
         return
     html = index_file.read_text(encoding="utf-8", errors="ignore")
     before = html
-    pattern = re.compile(r"<title>.*?</title>", re.IGNORECASE | re.DOTALL)
-    if pattern.search(html):
-        html = pattern.sub(f"<title>{title}</title>", html, count=1)
-    else:
-        head_close = re.compile(r"</head>", re.IGNORECASE)
-        if head_close.search(html):
-            html = head_close.sub(f"<title>{title}</title></head>", html, count=1)
-        else:
-            html = f"<head><title>{title}</title></head>" + html
+    html = _inject_title(html, title)
 
     if html != before:
         bak = static_dir / "index.html.bak"
@@ -153,110 +205,204 @@ def _apply_title_to_index_file(static_dir: Path, title: str):
         index_file.write_text(html, encoding="utf-8")
 
 
-# 根路径直接返回前端 index.html（200）。如文件不存在，回退到 /app/ 重定向。
-@app.get("/", include_in_schema=False)
-async def serve_root_index():
-    index_file = Path(settings.WEBAPP_STATIC_DIR).absolute() / "index.html"
-    if index_file.exists():
-        try:
-            html = index_file.read_text(encoding="utf-8", errors="ignore")
-            title_override = _get_title_override()
-            if title_override:
-                # 替换现有 <title>... </title>
-                pattern = re.compile(r"<title>.*?</title>", re.IGNORECASE | re.DOTALL)
-                if pattern.search(html):
-                    html = pattern.sub(f"<title>{title_override}</title>", html, count=1)
-                else:
-                    # 若缺失 <title>，则在 </head> 前插入
-                    head_close = re.compile(r"</head>", re.IGNORECASE)
-                    if head_close.search(html):
-                        html = head_close.sub(
-                            f"<title>{title_override}</title></head>", html, count=1
-                        )
-                    else:
-                        # 无 head，直接前置一个最简单的 head+title
-                        html = f"<head><title>{title_override}</title></head>" + html
-
-                # 为防止前端 JS 覆盖，再追加运行时强制设置 document.title 的脚本
-                _esc = (
-                    str(title_override)
-                    .replace("\\", "\\\\")
-                    .replace("'", "\\'")
-                )
-                override_script = (
-                    "<script>(function(){var t='" + _esc + "';"
-                    "function setTitle(){try{document.title=t;}catch(e){}}"
-                    "if(document.readyState==='loading'){document.addEventListener('DOMContentLoaded', setTitle);}else{setTitle();}"
-                    "window.addEventListener('load', setTitle);})();</script>"
-                )
-                head_close = re.compile(r"</head>", re.IGNORECASE)
-                if head_close.search(html):
-                    html = head_close.sub(override_script + "</head>", html, count=1)
-                else:
-                    html = "<head>" + override_script + "</head>" + html
-            return Response(
-                content=html,
-                media_type="text/html",
-                headers={"Cache-Control": "no-store, no-cache, must-revalidate, max-age=0"},
-            )
-        except Exception as e:
-            logger.error(f"读取或处理 index.html 失败: {e}")
-            # 兜底直接返回文件
-            return FileResponse(str(index_file))
-    return RedirectResponse(url="/app/")
+# 渲染后的 index.html 缓存：(mtime, 标题覆盖) -> UTF-8 字节，文件更新后 mtime 变化自动失效
+_INDEX_CACHE: dict[tuple[float, str | None], bytes] = {}
+# no-cache：浏览器可缓存但每次需携带 ETag 校验，未变化时返回 304 不传输正文
+_INDEX_CACHE_CONTROL = "no-cache"
+
 
+@functools.lru_cache(maxsize=8)
+def _build_override_script(title: str) -> str:
+    """生成运行时强制设置 document.title 的脚本，按标题缓存"""
+    # json.dumps 负责 JS 字符串转义；再转义 "</" 防止标题中的 </script> 提前闭合标签
+    js_title = json.dumps(title).replace("</", "<\\/")
+    return (
+        "<script>(function(){var t=" + js_title + ";"
+        "function setTitle(){try{document.title=t;}catch(e){}}"
+        "if(document.readyState==='loading'){document.addEventListener('DOMContentLoaded', setTitle);}else{setTitle();}"
+        "window.addEventListener('load', setTitle);})();</script>"
+    )
 
-@app.get("/app/", include_in_schema=False)
-async def serve_app_index():
-    # 与根路径相同的动态标题注入逻辑，覆盖静态挂载对 /app/ 的默认返回
-    index_file = Path(settings.WEBAPP_STATIC_DIR).absolute() / "index.html"
-    if index_file.exists():
+
+def _get_rendered_index(index_file: Path) -> bytes:
+    """返回注入标题后的 index.html 字节，仅在文件 mtime 或标题变化时重新读取渲染"""
+    mtime = index_file.stat().st_mtime
+    title_override = _get_title_override()
+    key = (mtime, title_override)
+    cached = _INDEX_CACHE.get(key)
+    if cached is not None:
+        return cached
+
+    content = index_file.read_bytes()
+    if title_override:
         try:
-            html = index_file.read_text(encoding="utf-8", errors="ignore")
-            title_override = _get_title_override()
-            if title_override:
-                pattern = re.compile(r"<title>.*?</title>", re.IGNORECASE | re.DOTALL)
-                if pattern.search(html):
-                    html = pattern.sub(f"<title>{title_override}</title>", html, count=1)
-                else:
-                    head_close = re.compile(r"</head>", re.IGNORECASE)
-                    if head_close.search(html):
-                        html = head_close.sub(
-                            f"<title>{title_override}</title></head>", html, count=1
-                        )
-                    else:
-                        html = f"<head><title>{title_override}</title></head>" + html
-
-                _esc = (
-                    str(title_override)
-                    .replace("\\", "\\\\")
-                    .replace("'", "\\'")
-                )
-                override_script = (
-                    "<script>(function(){var t='" + _esc + "';"
-                    "function setTitle(){try{document.title=t;}catch(e){}}"
-                    "if(document.readyState==='loading'){document.addEventListener('DOMContentLoaded', setTitle);}else{setTitle();}"
-                    "window.addEventListener('load', setTitle);})();</script>"
-                )
-                head_close = re.compile(r"</head>", re.IGNORECASE)
-                if head_close.search(html):
-                    html = head_close.sub(override_script + "</head>", html, count=1)
-                else:
-                    html = "<head>" + override_script + "</head>" + html
-            return Response(content=html, media_type="text/html")
+            html = content.decode("utf-8", errors="ignore")
+            # 为防止前端 JS 覆盖，同时追加运行时强制设置 document.title 的脚本
+            override_script = _build_override_script(title_override)
+            html = _inject_title(html, title_override, override_script)
+            content = html.encode("utf-8")
         except Exception as e:
-            logger.error(f"读取或处理 index.html 失败: {e}")
-            return FileResponse(str(index_file))
-    return RedirectResponse(url="/app/")
+            # 兜底直接返回原始文件内容；结果同样缓存，同一版本文件只记录一次
+            logger.error(f"处理 index.html 标题注入失败: {e}")
+    # 只保留最新一份渲染结果
+    _INDEX_CACHE.clear()
+    _INDEX_CACHE[key] = content
+    return content
+
+
+def _load_index() -> bytes | None:
+    """读取并渲染 index.html，文件不存在时返回 None。包含阻塞 I/O，应在线程中调用"""
+    if not _INDEX_FILE.exists():
+        return None
+    return _get_rendered_index(_INDEX_FILE)
+
+
+async def _build_index_response(app: FastAPI) -> bool:
+    """预先渲染 index.html 并保存到 app.state，供根路径与 /app/ 路由直接返回
+
+    由 lifespan 在启动时调用，之后由后台任务定期调用以感知前端文件更新；
+    文件未变化时命中 _INDEX_CACHE，不会重复读取渲染。磁盘读取在线程中进行，
+    app.state 仍在事件循环中更新，保证内容与响应头一致。
+
+    读取失败（权限、被替换为目录、部署时被短暂删除等）不会向外抛出，
+    以免影响 lifespan 启动及 /api/* 路由：继续使用上一次的内容，同一错误只记录一次。
+    """
+    try:
+        content = await asyncio.to_thread(_load_index)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        if error != getattr(app.state, "index_error", None):
+            logger.error(f"读取 index.html 失败，继续使用上一次的内容: {error}")
+            app.state.index_error = error
+        if getattr(app.state, "index_html_bytes", None) is None:
+            app.state.index_html_bytes = None
+            app.state.index_etag = None
+            app.state.index_headers = None
+            return False
+        return True
+
+    if getattr(app.state, "index_error", None):
+        logger.info("index.html 已恢复读取")
+    app.state.index_error = None
+    if content is None:
+        app.state.index_html_bytes = None
+        app.state.index_etag = None
+        app.state.index_headers = None
+        return False
+
+    if content is not getattr(app.state, "index_html_bytes", None):
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        app.state.index_html_bytes = content
+        app.state.index_etag = etag
+        # 响应头随内容一起预先生成，请求时无需再计算长度或拼接 Content-Type
+        app.state.index_headers = {
+            "Content-Length": str(len(content)),
+            "Content-Type": "text/html; charset=utf-8",
+            "ETag": etag,
+            "Cache-Control": _INDEX_CACHE_CONTROL,
+        }
+    return True
+
+
+# 创建 FastAPI 应用
+app = FastAPI(
+    title="PMSManageBot API",
+    description="API for PMSManageBot WebApp",
+    lifespan=create_lifespan(_build_index_response),
+)
+
+# 配置 SessionMiddleware
+app.add_middleware(
+    SessionMiddleware,
+    secret_key=_resolve_session_secret(),
+    session_cookie="pmsmanagebot_session",
+    max_age=86400,  # 1天过期
+)
+
+# 配置 CORS
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # 在生产环境中，应该设置为特定的域名
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+# 添加 Telegram 认证中间件
+app.add_middleware(TelegramAuthMiddleware)
+
+# 注册路由
+app.include_router(user_router)
+app.include_router(rankings_router)
+app.include_router(system_router)  # 添加系统统计路由
+app.include_router(invitation_router)  # 添加邀请码路由
+app.include_router(premium_router)  # 添加 Premium 路由
+app.include_router(admin_router)  # 添加管理员路由
+app.include_router(luckywheel_router, prefix="/api")  # 添加幸运大转盘路由
+app.include_router(auction_router, prefix="/api")  # 添加竞拍活动路由
+
+
+class CachedHTMLResponse(HTMLResponse):
+    """正文已是预渲染好的 UTF-8 字节，跳过 render 中的类型判断与编码"""
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """判断 If-None-Match 是否命中当前 ETag（忽略弱校验前缀 W/）"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def _index_response(request: Request) -> Response:
+    state = request.app.state
+    content = getattr(state, "index_html_bytes", None)
+    if content is None:
+        return RedirectResponse(url="/app/")
+    etag = state.index_etag
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": _INDEX_CACHE_CONTROL},
+        )
+    return CachedHTMLResponse(content=content, headers=state.index_headers)
+
+
+# 根路径直接返回前端 index.html（200）。如文件不存在，回退到 /app/ 重定向。
+@app.get("/", include_in_schema=False, response_class=CachedHTMLResponse)
+async def serve_root_index(request: Request):
+    return _index_response(request)
+
+
+async def serve_app_index(request: Request):
+    # 与根路径返回相同的预渲染内容，覆盖静态挂载对 /app/ 的默认返回
+    return _index_response(request)
+
+
+# /app/ 与 /app（兼容无斜杠访问）注册同一个处理函数
+app.add_api_route(
+    "/app/",
+    serve_app_index,
+    methods=["GET"],
+    include_in_schema=False,
+    response_class=CachedHTMLResponse,
+)
+app.add_api_route(
+    "/app",
+    serve_app_index,
+    methods=["GET"],
+    include_in_schema=False,
+    response_class=CachedHTMLResponse,
+)
 
 
 @app.head("/", include_in_schema=False)
 async def root_head_ok():
     # 允许对根路径发起 HEAD 探测，返回 200
     return Response(status_code=200)
-
-
-# 兼容 /app 无斜杠访问，复用相同逻辑
-@app.get("/app", include_in_schema=False)
-async def serve_app_index_no_slash():
-    return await serve_app_index()
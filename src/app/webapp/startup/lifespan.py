@@ -1,16 +1,59 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
+from typing import Awaitable, Callable
 
 from app.log import logger
 from app.utils import cleanup_http_resources
 from fastapi import FastAPI
 
+# 检查前端 index.html 是否更新的间隔（秒）
+INDEX_REFRESH_INTERVAL = 10
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    try:
-        logger.info("Application startup")
-        yield
-    finally:
-        # 清理全局 HTTP 资源
-        await cleanup_http_resources()
-        logger.info("Application shutdown")
+# 预渲染 index.html 并写入 app.state 的函数，返回 index.html 是否可用；
+# 读取失败由其自行记录并保留上一次的内容，不向外抛出
+IndexBuilder = Callable[[FastAPI], Awaitable[bool]]
+
+
+async def _watch_index(app: FastAPI, build_index: IndexBuilder):
+    """定期刷新预渲染的 index.html，前端重新部署后无需重启服务"""
+    while True:
+        await asyncio.sleep(INDEX_REFRESH_INTERVAL)
+        await build_index(app)
+
+
+def _check_routes(app: FastAPI):
+    """记录已注册路由数量，并提示重复注册的 (路径, 方法)"""
+    seen = set()
+    for route in app.router.routes:
+        for method in getattr(route, "methods", None) or ():
+            key = (route.path, method)
+            if key in seen:
+                logger.warning(f"路由重复注册: {method} {route.path}")
+            seen.add(key)
+    logger.debug(f"已注册路由数: {len(app.router.routes)}")
+
+
+def create_lifespan(build_index: IndexBuilder):
+    """创建应用 lifespan，启动时通过 build_index 预渲染 index.html 并定期刷新"""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        watcher = None
+        try:
+            logger.info("Application startup")
+            _check_routes(app)
+            # 启动时预渲染 index.html，请求路径上不再读取文件和注入标题
+            if not await build_index(app):
+                logger.warning("WebApp index.html 不可用，根路径将重定向到 /app/")
+            watcher = asyncio.create_task(_watch_index(app, build_index))
+            yield
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+                with suppress(asyncio.CancelledError):
+                    await watcher
+            # 清理全局 HTTP 资源
+            await cleanup_http_resources()
+            logger.info("Application shutdown")
+
+    return lifespan